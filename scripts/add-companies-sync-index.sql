@@ -0,0 +1,17 @@
+-- Support keyset pagination on (updated_at, id) for the local companies mirror
+CREATE INDEX IF NOT EXISTS idx_companies_updated_at_id ON companies(updated_at, id);
+
+-- Let the server assign updated_at on every insert and update so the
+-- incremental sync cursor only moves forward, whatever clock a client has
+CREATE OR REPLACE FUNCTION set_companies_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS companies_set_updated_at ON companies;
+CREATE TRIGGER companies_set_updated_at
+    BEFORE INSERT OR UPDATE ON companies
+    FOR EACH ROW EXECUTE FUNCTION set_companies_updated_at();
@@ -0,0 +1,384 @@
+"""
+Local SQLite mirror of the Supabase companies table.
+
+Syncs incrementally with keyset pagination on (updated_at, id) and indexes
+normalized email, domain and name so the ingest pipeline can decide whether a
+scraped record is new, unchanged or changed without a round trip per record.
+Only email matches and domain matches between two site-root URLs are trusted
+for updates. A match on name alone, or on the domain of a deeper page, is
+reported separately so curated rows are never overwritten by a guess. Shared
+hosts such as facebook.com never identify a company by domain.
+
+Any source exposing fetch_page(after_updated_at, after_id, limit) can feed the
+mirror: SupabaseCompaniesSource for production, PostgresCompaniesSource for a
+local Postgres stand-in.
+"""
+
+import os
+import re
+import html
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Columns mirrored locally (password_hash is deliberately left out)
+MIRROR_COLUMNS = [
+    "id",
+    "company_name",
+    "email",
+    "website_url",
+    "sector",
+    "description",
+    "contact_info",
+    "social_enterprise_status",
+    "related_news_updates",
+    "program_participation",
+    "created_at",
+    "updated_at",
+]
+
+# Fields a scraped record may update on a matched company
+CONTENT_FIELDS = [
+    "company_name",
+    "email",
+    "website_url",
+    "sector",
+    "description",
+    "contact_info",
+    "social_enterprise_status",
+    "related_news_updates",
+    "program_participation",
+]
+
+# Hosts serving pages for many unrelated companies
+SHARED_HOSTS = {
+    "facebook.com",
+    "instagram.com",
+    "linkedin.com",
+    "twitter.com",
+    "x.com",
+    "youtube.com",
+    "tiktok.com",
+    "linktr.ee",
+    "wa.me",
+    "sites.google.com",
+    "wixsite.com",
+    "shopee.com.my",
+    "lazada.com.my",
+}
+
+LEGAL_SUFFIXES = re.compile(
+    r"\b(sdn\s+bhd|bhd|berhad|plt|pte|ltd|limited|inc|llc|co)\b", re.IGNORECASE
+)
+
+
+def normalize_email(email):
+    email = (email or "").strip().lower()
+    if email.startswith("mailto:"):
+        email = email[len("mailto:") :]
+    return email or None
+
+
+def normalize_domain(url):
+    url = (url or "").strip().lower()
+    if not url:
+        return None
+    if "//" not in url:
+        url = "//" + url
+    host = urlparse(url).hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host or None
+
+
+def is_shared_host(domain):
+    """Whether a normalized domain belongs to a host shared by many companies"""
+    return any(domain == host or domain.endswith("." + host) for host in SHARED_HOSTS)
+
+
+def is_site_root(url):
+    """Whether a URL points at the root of its site rather than a deeper page"""
+    url = (url or "").strip()
+    if "//" not in url:
+        url = "//" + url
+    parsed = urlparse(url)
+    return parsed.path in ("", "/") and not parsed.query
+
+
+def strong_keys(record):
+    """
+    Return the (column, value) keys that identify a company on their own:
+    its email and the domain of a site-root URL on a host it does not share
+    """
+    keys = []
+    email = normalize_email(record.get("email"))
+    if email:
+        keys.append(("email_norm", email))
+    domain = normalize_domain(record.get("website_url"))
+    if domain and is_site_root(record.get("website_url")) and not is_shared_host(domain):
+        keys.append(("domain_norm", domain))
+    return keys
+
+
+def normalize_name(name):
+    name = html.unescape(name or "").lower()
+    name = re.sub(r"[^\w\s]", " ", name)
+    name = LEGAL_SUFFIXES.sub(" ", name)
+    return " ".join(name.split()) or None
+
+
+def _comparable(field, value):
+    if field == "email":
+        return normalize_email(value)
+    if field == "website_url":
+        return normalize_domain(value)
+    return " ".join(str(value or "").split()) or None
+
+
+def changed_fields(record, row):
+    """
+    Return the non-empty fields of a scraped record that differ from the
+    mirrored row. Empty scraped fields never clear existing values.
+    """
+    changes = {}
+    for field in CONTENT_FIELDS:
+        value = _comparable(field, record.get(field))
+        if value is not None and value != _comparable(field, row.get(field)):
+            changes[field] = record[field]
+    return changes
+
+
+def _timestamp(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class SupabaseCompaniesSource:
+    """Reads companies pages from Supabase ordered by (updated_at, id)"""
+
+    def __init__(self, client, table="companies"):
+        self.client = client
+        self.table = table
+
+    def fetch_page(self, after_updated_at, after_id, limit):
+        query = (
+            self.client.table(self.table)
+            .select(",".join(MIRROR_COLUMNS))
+            .order("updated_at")
+            .order("id")
+            .limit(limit)
+        )
+        if after_updated_at:
+            query = query.or_(
+                f'updated_at.gt."{after_updated_at}",'
+                f'and(updated_at.eq."{after_updated_at}",id.gt.{after_id})'
+            )
+        return query.execute().data or []
+
+
+class PostgresCompaniesSource:
+    """Reads companies pages from a DB-API Postgres connection (psycopg)"""
+
+    def __init__(self, connection, table="companies"):
+        self.connection = connection
+        self.table = table
+
+    def fetch_page(self, after_updated_at, after_id, limit):
+        columns = ", ".join(MIRROR_COLUMNS)
+        with self.connection.cursor() as cursor:
+            if after_updated_at:
+                cursor.execute(
+                    f"SELECT {columns} FROM {self.table} "
+                    "WHERE (updated_at, id) > (%s, %s) "
+                    "ORDER BY updated_at, id LIMIT %s",
+                    (after_updated_at, after_id, limit),
+                )
+            else:
+                cursor.execute(
+                    f"SELECT {columns} FROM {self.table} ORDER BY updated_at, id LIMIT %s",
+                    (limit,),
+                )
+            names = [column[0] for column in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            row["created_at"] = _timestamp(row["created_at"])
+            row["updated_at"] = _timestamp(row["updated_at"])
+        return rows
+
+
+class CompaniesMirror:
+    """SQLite copy of the companies table for local dedupe and change detection"""
+
+    def __init__(self, source, path="companies_mirror.sqlite3", page_size=500, lookback=60):
+        self.source = source
+        self.path = path
+        self.page_size = page_size
+        # Re-read rows this many seconds behind the cursor to catch late commits
+        self.lookback = lookback
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self._create_schema()
+
+    @classmethod
+    def from_env(cls, source):
+        """Build a mirror from SCRAPER_COMPANIES_MIRROR* environment variables"""
+        return cls(
+            source,
+            path=os.getenv("SCRAPER_COMPANIES_MIRROR", "companies_mirror.sqlite3"),
+            page_size=int(os.getenv("SCRAPER_COMPANIES_MIRROR_PAGE_SIZE", "500")),
+        )
+
+    def _create_schema(self):
+        columns = ",\n".join(
+            f"{column} INTEGER PRIMARY KEY" if column == "id" else f"{column} TEXT"
+            for column in MIRROR_COLUMNS
+        )
+        self.db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS companies (
+                {columns},
+                email_norm TEXT,
+                domain_norm TEXT,
+                name_norm TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_mirror_email ON companies(email_norm);
+            CREATE INDEX IF NOT EXISTS idx_mirror_domain ON companies(domain_norm);
+            CREATE INDEX IF NOT EXISTS idx_mirror_name ON companies(name_norm);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+
+    def _get_state(self, key, default=None):
+        row = self.db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def _set_state(self, key, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def _upsert(self, rows):
+        placeholders = ", ".join("?" for _ in range(len(MIRROR_COLUMNS) + 3))
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO companies ({', '.join(MIRROR_COLUMNS)}, "
+            f"email_norm, domain_norm, name_norm) VALUES ({placeholders})",
+            [
+                [_timestamp(row.get(column)) for column in MIRROR_COLUMNS]
+                + [
+                    normalize_email(row.get("email")),
+                    normalize_domain(row.get("website_url")),
+                    normalize_name(row.get("company_name")),
+                ]
+                for row in rows
+            ],
+        )
+
+    def sync(self):
+        """Pull rows changed since the last sync. Returns the number of rows applied."""
+        cursor_updated_at = self._get_state("cursor_updated_at")
+        cursor_id = int(self._get_state("cursor_id", 0))
+
+        if cursor_updated_at and self.lookback:
+            rewound = datetime.fromisoformat(cursor_updated_at) - timedelta(seconds=self.lookback)
+            cursor_updated_at, cursor_id = rewound.isoformat(), 0
+
+        applied = 0
+        while True:
+            rows = self.source.fetch_page(cursor_updated_at, cursor_id, self.page_size)
+            if not rows:
+                break
+
+            last = rows[-1]
+            cursor_updated_at, cursor_id = _timestamp(last["updated_at"]), last["id"]
+            with self.db:
+                self._upsert(rows)
+                self._set_state("cursor_updated_at", cursor_updated_at)
+                self._set_state("cursor_id", cursor_id)
+            applied += len(rows)
+
+            if len(rows) < self.page_size:
+                break
+
+        logger.info(f"Companies mirror synced {applied} rows")
+        return applied
+
+    def full_resync(self):
+        """Rebuild the mirror from scratch, dropping rows deleted upstream"""
+        with self.db:
+            self.db.execute("DELETE FROM companies")
+            self.db.execute("DELETE FROM sync_state")
+        return self.sync()
+
+    def record_saved(self, rows):
+        """Apply rows just written to Supabase without waiting for the next sync"""
+        with self.db:
+            self._upsert(rows)
+
+    def _lookup(self, column, value):
+        return [
+            dict(row)
+            for row in self.db.execute(f"SELECT * FROM companies WHERE {column} = ?", (value,))
+        ]
+
+    def _match(self, record):
+        """
+        Return (row, matched_column, strong) for the best key that finds a
+        company. Domain matches are strong only when both URLs are site roots.
+        """
+        for column, value in strong_keys(record):
+            for row in self._lookup(column, value):
+                if column != "domain_norm" or is_site_root(row["website_url"]):
+                    return row, column, True
+
+        weak_lookups = [("name_norm", normalize_name(record.get("company_name")))]
+        domain = normalize_domain(record.get("website_url"))
+        if domain and not is_shared_host(domain):
+            weak_lookups.insert(0, ("domain_norm", domain))
+        for column, value in weak_lookups:
+            if not value:
+                continue
+            rows = self._lookup(column, value)
+            if rows:
+                return rows[0], column, False
+        return None, None, False
+
+    def find(self, record, strong_only=False):
+        """
+        Find the mirrored company matching a record by email, domain or name.
+        With strong_only, matches that are not trusted for updates are ignored.
+        """
+        row, _, strong = self._match(record)
+        if strong_only and not strong:
+            return None
+        return row
+
+    def classify(self, record):
+        """
+        Return (status, company_id, changes) for a scraped record. status is
+        "new", "unchanged", "changed" (matched on a strong key; changes holds
+        the fields to update), "name_match" (matched on name only) or
+        "weak_match" (matched on the domain of a deeper page). Name and weak
+        matches are not trusted for updates.
+        """
+        row, column, strong = self._match(record)
+        if row is None:
+            return "new", None, {}
+        if not strong:
+            return ("name_match" if column == "name_norm" else "weak_match"), row["id"], {}
+
+        changes = changed_fields(record, row)
+        if changes:
+            return "changed", row["id"], changes
+        return "unchanged", row["id"], {}
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,26 @@
+-- Create company_news table holding dated news items per company
+CREATE TABLE IF NOT EXISTS company_news (
+    id SERIAL PRIMARY KEY,
+    company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    published_at TIMESTAMP WITH TIME ZONE,
+    summary TEXT,
+    source VARCHAR(20), -- rss, atom or sitemap
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (company_id, url)
+);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_company_news_company_published ON company_news(company_id, published_at DESC);
+
+-- Enable Row Level Security
+ALTER TABLE company_news ENABLE ROW LEVEL SECURITY;
+
+-- Allow public read access to news items
+CREATE POLICY "Allow public read access to company news" ON company_news
+    FOR SELECT USING (true);
+
+-- Allow insert for new news items
+CREATE POLICY "Allow insert for company news" ON company_news
+    FOR INSERT WITH CHECK (true);
@@ -0,0 +1,287 @@
+"""
+Persistent host health tracking for the scrapers.
+
+Remembers consecutive failures, recent latencies and the last success per host
+across runs. Hosts that keep failing trip a circuit breaker and are skipped
+until their cooldown expires, after which a single half-open probe with a short
+timeout decides whether the circuit closes again. Healthy hosts get a timeout
+derived from their own latency history instead of a fixed one. Parked domains
+answer with 200 but are treated as failing hosts.
+"""
+
+import os
+import json
+import time
+import logging
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Phrases and parking services that give away a parked or for-sale domain
+PARKED_PAGE_MARKERS = [
+    "this domain is for sale",
+    "this domain may be for sale",
+    "buy this domain",
+    "domain is parked",
+    "parked free, courtesy of godaddy",
+    "sedoparking.com",
+    "parkingcrew.net",
+    "bodis.com",
+    "hugedomains.com",
+    "dan.com/buy-domain",
+]
+
+# Parked pages are small landing pages; only their start is inspected
+PARKED_PAGE_SCAN_CHARS = 20000
+
+
+class ParkedDomainError(requests.RequestException):
+    """Raised when a host answers with a domain parking page"""
+
+
+def is_parked_page(html):
+    """Whether a fetched page looks like a parked or for-sale domain"""
+    text = (html or "")[:PARKED_PAGE_SCAN_CHARS].lower()
+    return any(marker in text for marker in PARKED_PAGE_MARKERS)
+
+
+def host_key(url):
+    """Normalize a URL to the host it is tracked under"""
+    host = urlparse(url).netloc.lower() or url.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+def is_host_failure(error):
+    """
+    Whether an error says the host itself is unhealthy: connection errors,
+    timeouts, 5xx responses and parked domains. 4xx responses (404, 403,
+    429...) mean the host answered and do not count.
+    """
+    if isinstance(error, (ParkedDomainError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500
+    return False
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class HostHealthStore:
+    """JSON-backed per-host health records with a circuit breaker"""
+
+    def __init__(
+        self,
+        path="host_health.json",
+        failure_threshold=3,
+        base_cooldown=3600,
+        max_cooldown=7 * 24 * 3600,
+        min_timeout=5,
+        latency_multiplier=3,
+        latency_window=50,
+    ):
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.min_timeout = min_timeout
+        self.latency_multiplier = latency_multiplier
+        self.latency_window = latency_window
+        self.hosts = {}
+        # Hosts whose half-open probe has already been sent during this run
+        self._probing = set()
+        # Last (timeout, default) handed out per host during this run
+        self._issued_timeouts = {}
+        self.load()
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from SCRAPER_HOST_HEALTH* environment variables"""
+        return cls(
+            path=os.getenv("SCRAPER_HOST_HEALTH_PATH", "host_health.json"),
+            failure_threshold=int(os.getenv("SCRAPER_HOST_FAILURE_THRESHOLD", "3")),
+            base_cooldown=float(os.getenv("SCRAPER_HOST_COOLDOWN", "3600")),
+        )
+
+    def load(self):
+        """Load host records from disk, starting empty if none exist yet"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.hosts = json.load(f).get("hosts", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read host health from {self.path}: {e}")
+            self.hosts = {}
+
+    def save(self):
+        """Atomically write host records to disk"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"hosts": self.hosts}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _entry(self, url):
+        return self.hosts.setdefault(
+            host_key(url),
+            {
+                "consecutive_failures": 0,
+                "total_successes": 0,
+                "total_failures": 0,
+                "latencies": [],
+                "last_success": None,
+                "last_failure": None,
+                "last_error": "",
+                "opened_at": None,
+                "cooldown": 0,
+            },
+        )
+
+    def state(self, url):
+        """Return the circuit state for the host of a URL"""
+        entry = self.hosts.get(host_key(url))
+        if not entry or entry["opened_at"] is None:
+            return CLOSED
+        if time.time() - entry["opened_at"] >= entry["cooldown"]:
+            return HALF_OPEN
+        return OPEN
+
+    def allow_request(self, url):
+        """
+        Decide whether a URL should be fetched. Open circuits are skipped and a
+        half-open circuit lets exactly one probe through per run.
+        """
+        state = self.state(url)
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            host = host_key(url)
+            if host in self._probing:
+                return False
+            self._probing.add(host)
+            logger.info(f"Probing {host} after circuit cooldown")
+            return True
+        return False
+
+    def latency_percentiles(self, url):
+        """Return p50 and p95 latency in seconds for the host of a URL"""
+        entry = self.hosts.get(host_key(url))
+        latencies = entry["latencies"] if entry else []
+        return {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)}
+
+    def timeout_for(self, url, default=30):
+        """
+        Derive a request timeout from the host's latency history, never longer
+        than the caller's default. Half-open probes get a short timeout so a
+        still-dead host costs little.
+        """
+        p95 = self.latency_percentiles(url)["p95"]
+        if self.state(url) == HALF_OPEN:
+            probe = p95 * self.latency_multiplier if p95 else self.min_timeout
+            timeout = min(default, max(self.min_timeout, probe))
+        elif p95 is None:
+            timeout = default
+        else:
+            timeout = min(default, max(self.min_timeout, p95 * self.latency_multiplier))
+
+        self._issued_timeouts[host_key(url)] = (timeout, default)
+        return timeout
+
+    def _add_latency(self, entry, latency):
+        entry["latencies"] = (entry["latencies"] + [round(latency, 3)])[
+            -self.latency_window :
+        ]
+
+    def record_success(self, url, latency):
+        """Record a successful fetch and close the host's circuit"""
+        entry = self._entry(url)
+        entry["consecutive_failures"] = 0
+        entry["total_successes"] += 1
+        self._add_latency(entry, latency)
+        entry["last_success"] = time.time()
+        entry["opened_at"] = None
+        entry["cooldown"] = 0
+        self._probing.discard(host_key(url))
+
+    def record_failure(self, url, error):
+        """
+        Record a failed fetch, opening the circuit once host failures pile up.
+        Errors that are not host failures only update last_error; the host
+        answered, so its circuit is closed again.
+        """
+        entry = self._entry(url)
+        if not is_host_failure(error):
+            entry["last_error"] = str(error)[:300]
+            entry["consecutive_failures"] = 0
+            entry["opened_at"] = None
+            entry["cooldown"] = 0
+            self._probing.discard(host_key(url))
+            return
+
+        timeout, default = self._issued_timeouts.get(host_key(url), (None, None))
+        if (
+            isinstance(error, requests.ReadTimeout)
+            and timeout is not None
+            and timeout < default
+        ):
+            # The host answered but was slower than our own shortened timeout.
+            # Record the wait as a latency so the derived timeout grows back,
+            # rather than counting it against the host.
+            self._add_latency(entry, timeout)
+            entry["last_error"] = str(error)[:300]
+            self._probing.discard(host_key(url))
+            return
+
+        entry["consecutive_failures"] += 1
+        entry["total_failures"] += 1
+        entry["last_failure"] = time.time()
+        entry["last_error"] = str(error)[:300]
+
+        excess = entry["consecutive_failures"] - self.failure_threshold
+        if excess >= 0:
+            # Back off exponentially on every failed probe
+            entry["cooldown"] = min(self.max_cooldown, self.base_cooldown * 2**excess)
+            entry["opened_at"] = time.time()
+            logger.warning(
+                f"Circuit open for {host_key(url)} after "
+                f"{entry['consecutive_failures']} failures, "
+                f"retrying in {entry['cooldown'] / 3600:.1f}h"
+            )
+        self._probing.discard(host_key(url))
+
+    def prioritize(self, urls):
+        """
+        Order URLs so healthy, fast hosts are fetched first and hosts with
+        open circuits or recent failures come last.
+        """
+        state_rank = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+        def sort_key(url):
+            entry = self.hosts.get(host_key(url), {})
+            p50 = self.latency_percentiles(url)["p50"]
+            return (
+                state_rank[self.state(url)],
+                entry.get("consecutive_failures", 0),
+                p50 if p50 is not None else 0,
+            )
+
+        return sorted(urls, key=sort_key)
@@ -0,0 +1,470 @@
+"""
+Feed and sitemap based news tracking for the scrapers.
+
+Discovers each site's RSS/Atom feeds and sitemaps, polls them with conditional
+requests and returns only the dated news items published since the last item
+seen for that site. Sitemaps are only consulted for sites without a feed, and
+only their news-like URLs with a newer lastmod are kept.
+"""
+
+import os
+import re
+import json
+import html
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from host_health import host_key
+
+try:
+    from defusedxml.ElementTree import fromstring as parse_xml, ParseError
+except ImportError:  # stdlib parser; documents are still size-capped before parsing
+    from xml.etree.ElementTree import fromstring as parse_xml, ParseError
+
+logger = logging.getLogger(__name__)
+
+FEED_TYPES = ("application/rss+xml", "application/atom+xml", "application/feed+xml")
+
+# Conventional feed locations probed when a homepage advertises none
+COMMON_FEED_PATHS = ["/feed", "/rss.xml", "/atom.xml", "/feed.xml"]
+
+# Sitemap URLs that look like news, blog or press pages
+NEWS_PATH_PATTERN = re.compile(
+    r"/(news|blog|press|updates|media|stories|articles|posts?|announcements?)/",
+    re.IGNORECASE,
+)
+
+# defusedxml reports entity expansion and DTD tricks as ValueError subclasses
+XML_ERRORS = (ParseError, ValueError)
+
+# Feeds and sitemaps larger than this are not downloaded in full or parsed
+MAX_DOCUMENT_BYTES = 5 * 1024 * 1024
+
+FEED_ACCEPT = "application/rss+xml, application/atom+xml, application/xml;q=0.9, */*;q=0.8"
+
+# Root elements of RSS 2.0, RSS 1.0 (RDF) and Atom documents
+FEED_ROOTS = ("rss", "RDF", "feed")
+
+SITEMAP_ROOTS = ("urlset", "sitemapindex")
+
+
+def _local(tag):
+    """Strip the XML namespace from an element tag"""
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _child(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _child_text(element, *names):
+    for name in names:
+        child = _child(element, name)
+        if child is not None and child.text and child.text.strip():
+            return child.text.strip()
+    return ""
+
+
+def clean_html(text):
+    """Reduce an HTML fragment from a feed to plain text"""
+    text = html.unescape(re.sub(r"<[^>]+>", " ", text or ""))
+    return " ".join(text.split())
+
+
+def parse_date(text):
+    """Parse RFC 822 or ISO 8601 dates into an ISO 8601 UTC string"""
+    if not text:
+        return ""
+
+    parsed = None
+    try:
+        parsed = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return ""
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def parse_feed(content, base_url=""):
+    """
+    Parse an RSS or Atom document into news items. Raises ValueError for
+    well-formed XML that is not a feed, such as an XHTML error page.
+    """
+    root = parse_xml(content)
+    if _local(root.tag) not in FEED_ROOTS:
+        raise ValueError(f"Not an RSS or Atom feed: <{_local(root.tag)}> root")
+    items = []
+
+    if _local(root.tag) == "feed":
+        for entry in root:
+            if _local(entry.tag) != "entry":
+                continue
+            link = ""
+            for child in entry:
+                if _local(child.tag) == "link" and child.get("rel", "alternate") == "alternate":
+                    link = child.get("href", "")
+                    break
+            items.append(
+                {
+                    "title": clean_html(_child_text(entry, "title")),
+                    "url": urljoin(base_url, link),
+                    "published": parse_date(_child_text(entry, "published", "updated")),
+                    "summary": clean_html(_child_text(entry, "summary", "content"))[:500],
+                    "source": "atom",
+                    "id": _child_text(entry, "id") or link,
+                }
+            )
+    else:
+        for item in root.iter():
+            if _local(item.tag) != "item":
+                continue
+            link = _child_text(item, "link")
+            items.append(
+                {
+                    "title": clean_html(_child_text(item, "title")),
+                    "url": urljoin(base_url, link),
+                    "published": parse_date(_child_text(item, "pubDate", "date")),
+                    "summary": clean_html(_child_text(item, "description", "encoded"))[:500],
+                    "source": "rss",
+                    "id": _child_text(item, "guid") or link,
+                }
+            )
+
+    return items
+
+
+def parse_sitemap(content):
+    """
+    Parse a sitemap or sitemap index.
+    Returns (pages, child_sitemaps) as lists of (loc, lastmod) tuples.
+    Raises ValueError for well-formed XML that is not a sitemap.
+    """
+    root = parse_xml(content)
+    if _local(root.tag) not in SITEMAP_ROOTS:
+        raise ValueError(f"Not a sitemap: <{_local(root.tag)}> root")
+    pages, children = [], []
+
+    for entry in root:
+        loc = _child_text(entry, "loc")
+        if not loc:
+            continue
+        lastmod = parse_date(_child_text(entry, "lastmod"))
+        if _local(entry.tag) == "sitemap":
+            children.append((loc, lastmod))
+        elif _local(entry.tag) == "url":
+            pages.append((loc, lastmod))
+
+    return pages, children
+
+
+def title_from_url(url):
+    """Build a readable title from the last path segment of a URL"""
+    slug = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+    slug = re.sub(r"\.\w+$", "", slug)
+    return re.sub(r"[-_]+", " ", slug).strip().capitalize()
+
+
+class NewsFeedTracker:
+    """Incrementally collects dated news items per site from feeds and sitemaps"""
+
+    def __init__(
+        self,
+        session=None,
+        state_path="news_state.json",
+        timeout=10,
+        max_items=20,
+        recent_limit=10,
+        max_child_sitemaps=5,
+        max_bytes=MAX_DOCUMENT_BYTES,
+    ):
+        self.session = session or requests.Session()
+        self.state_path = state_path
+        self.timeout = timeout
+        self.max_items = max_items
+        self.recent_limit = recent_limit
+        self.max_child_sitemaps = max_child_sitemaps
+        self.max_bytes = max_bytes
+        self.sites = {}
+        # last_seen per host before this run's fetch, for forget_items
+        self._previous_last_seen = {}
+        self.load()
+
+    @classmethod
+    def from_env(cls, session=None):
+        """Build a tracker from SCRAPER_NEWS* environment variables"""
+        return cls(
+            session=session,
+            state_path=os.getenv("SCRAPER_NEWS_STATE_PATH", "news_state.json"),
+            max_items=int(os.getenv("SCRAPER_NEWS_MAX_ITEMS", "20")),
+        )
+
+    def load(self):
+        """Load per-site feed state from disk, starting empty if none exists yet"""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.sites = json.load(f).get("sites", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read news state from {self.state_path}: {e}")
+            self.sites = {}
+
+    def save(self):
+        """Atomically write per-site feed state to disk"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sites": self.sites}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def _site(self, url):
+        return self.sites.setdefault(
+            host_key(url),
+            {
+                "homepage": url,
+                "feeds": [],
+                "sitemaps": [],
+                "discovered": False,
+                "validators": {},
+                "last_seen": "",
+                "seen_ids": [],
+                "recent": [],
+            },
+        )
+
+    def discover_from_page(self, url, soup):
+        """Record feeds advertised by an already parsed homepage (no requests)"""
+        site = self._site(url)
+        for link in soup.find_all("link", href=True):
+            rel = link.get("rel") or []
+            if isinstance(rel, str):
+                rel = rel.split()
+            link_type = (link.get("type") or "").lower()
+            if "alternate" in rel and link_type in FEED_TYPES:
+                feed_url = urljoin(url, link["href"])
+                if feed_url not in site["feeds"]:
+                    site["feeds"].append(feed_url)
+        return site["feeds"]
+
+    def _discover_remote(self, url, site):
+        """
+        Find feeds and sitemaps via robots.txt and conventional paths, once per
+        site. Returns the items of a feed found by probing so it is not fetched
+        twice, or None when no feed was probed.
+        """
+        site["discovered"] = True
+
+        robots = self._get(site, urljoin(url, "/robots.txt"), conditional=False)
+        if robots is not None:
+            for line in robots[1].decode("utf-8", "replace").splitlines():
+                if line.lower().startswith("sitemap:"):
+                    sitemap_url = line.split(":", 1)[1].strip()
+                    if sitemap_url and sitemap_url not in site["sitemaps"]:
+                        site["sitemaps"].append(sitemap_url)
+        if not site["sitemaps"]:
+            site["sitemaps"].append(urljoin(url, "/sitemap.xml"))
+
+        if site["feeds"]:
+            return None
+
+        for path in COMMON_FEED_PATHS:
+            feed_url = urljoin(url, path)
+            fetched = self._get(site, feed_url, accept=FEED_ACCEPT, conditional=False)
+            if fetched is None:
+                continue
+            response, content = fetched
+            try:
+                items = parse_feed(content, feed_url)
+            except XML_ERRORS:
+                continue
+            site["feeds"].append(feed_url)
+            self._remember_validators(site, feed_url, response)
+            return items
+        return None
+
+    def _get(self, site, url, accept=None, conditional=True):
+        """
+        Fetch a feed or sitemap, sending the stored ETag/Last-Modified.
+        Returns (response, content), or None for 304 Not Modified, failed
+        requests and documents larger than max_bytes.
+        """
+        headers = {}
+        if accept:
+            headers["Accept"] = accept
+
+        validators = site["validators"].get(url, {})
+        if conditional:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        try:
+            # Closing the streamed response on every path returns the
+            # connection to the pool
+            with self.session.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            ) as response:
+                if response.status_code == 304:
+                    return None
+                response.raise_for_status()
+
+                content = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    content.extend(chunk)
+                    if len(content) > self.max_bytes:
+                        logger.warning(f"Skipping {url}: larger than {self.max_bytes} bytes")
+                        return None
+        except requests.RequestException as e:
+            logger.debug(f"Could not fetch {url}: {e}")
+            return None
+
+        return response, bytes(content)
+
+    def _remember_validators(self, site, url, response):
+        """Store ETag/Last-Modified once a document has been parsed successfully"""
+        site["validators"][url] = {
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", ""),
+        }
+
+    def _feed_items(self, site):
+        items = []
+        for feed_url in site["feeds"]:
+            fetched = self._get(site, feed_url, accept=FEED_ACCEPT)
+            if fetched is None:
+                continue
+            response, content = fetched
+            try:
+                items.extend(parse_feed(content, feed_url))
+            except XML_ERRORS as e:
+                logger.warning(f"Invalid feed at {feed_url}: {e}")
+                continue
+            self._remember_validators(site, feed_url, response)
+        return items
+
+    def _sitemap_items(self, site):
+        items = []
+        pending = list(site["sitemaps"])
+        followed = 0
+
+        while pending:
+            sitemap_url = pending.pop(0)
+            fetched = self._get(site, sitemap_url)
+            if fetched is None:
+                continue
+            response, content = fetched
+            try:
+                pages, children = parse_sitemap(content)
+            except XML_ERRORS as e:
+                logger.warning(f"Invalid sitemap at {sitemap_url}: {e}")
+                continue
+            self._remember_validators(site, sitemap_url, response)
+
+            for child_url, lastmod in children:
+                if followed >= self.max_child_sitemaps:
+                    break
+                if not lastmod or lastmod > site["last_seen"]:
+                    pending.append(child_url)
+                    followed += 1
+
+            for loc, lastmod in pages:
+                if lastmod and NEWS_PATH_PATTERN.search(urlparse(loc).path):
+                    items.append(
+                        {
+                            "title": title_from_url(loc),
+                            "url": loc,
+                            "published": lastmod,
+                            "summary": "",
+                            "source": "sitemap",
+                            "id": loc,
+                        }
+                    )
+        return items
+
+    def fetch_new_items(self, url):
+        """
+        Return dated news items for a site published since the last item seen,
+        newest first. Feeds are preferred; sitemaps are used when a site has none.
+        Items are marked seen in memory; call save() only once they are stored.
+        """
+        site = self._site(url)
+        probed = None
+        if not site["discovered"]:
+            probed = self._discover_remote(url, site)
+
+        if probed is not None:
+            items = probed
+        elif site["feeds"]:
+            items = self._feed_items(site)
+        else:
+            items = self._sitemap_items(site)
+
+        seen_ids = set(site["seen_ids"])
+        new_items = []
+        for item in items:
+            # Undated items cannot advance last_seen, so they are not tracked
+            if not item["title"] or not item["published"]:
+                continue
+            item["id"] = item["id"] or item["title"]
+            if item["id"] in seen_ids or item["published"] <= site["last_seen"]:
+                continue
+            seen_ids.add(item["id"])
+            new_items.append(item)
+
+        new_items.sort(key=lambda item: item["published"], reverse=True)
+        new_items = new_items[: self.max_items]
+
+        if new_items:
+            self._previous_last_seen.setdefault(host_key(url), site["last_seen"])
+            site["last_seen"] = max(site["last_seen"], new_items[0]["published"])
+            site["seen_ids"] = (site["seen_ids"] + [item["id"] for item in new_items])[-500:]
+            site["recent"] = (new_items + site["recent"])[: self.recent_limit]
+            logger.info(f"Found {len(new_items)} new news items for {host_key(url)}")
+
+        return new_items
+
+    def forget_items(self, url, items):
+        """
+        Un-mark items returned by fetch_new_items that were not stored, so a
+        later run offers them again
+        """
+        site = self.sites.get(host_key(url))
+        if not site or not items:
+            return
+
+        ids = {item["id"] for item in items}
+        site["seen_ids"] = [seen for seen in site["seen_ids"] if seen not in ids]
+        site["recent"] = [item for item in site["recent"] if item["id"] not in ids]
+        site["last_seen"] = max(
+            [self._previous_last_seen.get(host_key(url), "")]
+            + [item["published"] for item in site["recent"]]
+        )
+
+    def recent_items(self, url, limit=3):
+        """Return the most recent stored items for a site"""
+        site = self.sites.get(host_key(url))
+        return site["recent"][:limit] if site else []
+
+    def summarize(self, url, limit=3):
+        """Summarize the latest items as a related_news_updates string"""
+        parts = []
+        for item in self.recent_items(url, limit):
+            date = item["published"][:10]
+            parts.append(f"{item['title']} ({date})" if date else item["title"])
+        return "; ".join(parts)
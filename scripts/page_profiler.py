@@ -0,0 +1,235 @@
+"""
+Opt-in per-page profiling for the scrapers.
+
+Wraps the parse and extraction of each page with cProfile and tracemalloc,
+dumps a profile for every page that crosses the time or memory threshold and
+writes an end-of-run report of the slowest and heaviest pages broken down by
+extractor. When disabled, every hook returns a shared no-op context manager.
+"""
+
+import os
+import re
+import json
+import time
+import cProfile
+import logging
+import tracemalloc
+from contextlib import nullcontext
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Shared no-op context returned by every hook while profiling is disabled
+_NULL_CONTEXT = nullcontext()
+
+
+class _PageProfile:
+    """Context manager profiling a single page"""
+
+    def __init__(self, profiler, url):
+        self.profiler = profiler
+        self.url = url
+        self.stages = {}
+        self.elapsed = 0.0
+        self.peak_memory = 0
+        self._profile = cProfile.Profile()
+        self._start = 0.0
+        self._base_memory = 0
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self._base_memory = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        self.elapsed = time.perf_counter() - self._start
+        self._track_peak()
+        self.profiler._finish_page(self, failed=exc_type is not None)
+        return False
+
+    def _track_peak(self):
+        """Fold the tracemalloc peak since the last reset into the page peak"""
+        peak = tracemalloc.get_traced_memory()[1] - self._base_memory
+        self.peak_memory = max(self.peak_memory, peak)
+
+    def stage(self, name):
+        return _StageProfile(self, name)
+
+
+class _StageProfile:
+    """Context manager timing one extractor within a page"""
+
+    def __init__(self, page, name):
+        self.page = page
+        self.name = name
+        self._start = 0.0
+        self._start_memory = 0
+
+    def __enter__(self):
+        # Keep the page-level peak before resetting it for this stage
+        self.page._track_peak()
+        tracemalloc.reset_peak()
+        self._start_memory = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        peak = tracemalloc.get_traced_memory()[1] - self._start_memory
+        self.page._track_peak()
+
+        stats = self.page.stages.setdefault(self.name, {"seconds": 0.0, "peak_bytes": 0})
+        stats["seconds"] += elapsed
+        stats["peak_bytes"] = max(stats["peak_bytes"], peak)
+        return False
+
+
+class PageProfiler:
+    """Collects per-page profiles and reports the slowest and heaviest pages"""
+
+    def __init__(
+        self,
+        enabled=False,
+        time_threshold=2.0,
+        memory_threshold=50 * 1024 * 1024,
+        output_dir="profiles",
+        top_n=10,
+    ):
+        self.enabled = enabled
+        self.time_threshold = time_threshold
+        self.memory_threshold = memory_threshold
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.pages = []
+        self._current = None
+        self._started_tracing = False
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a profiler from SCRAPER_PROFILE* environment variables.
+        Profiling stays disabled unless SCRAPER_PROFILE is set to a true value.
+        """
+        enabled = os.getenv("SCRAPER_PROFILE", "").lower() in ("1", "true", "yes")
+        return cls(
+            enabled=enabled,
+            time_threshold=float(os.getenv("SCRAPER_PROFILE_TIME_THRESHOLD", "2.0")),
+            memory_threshold=int(
+                float(os.getenv("SCRAPER_PROFILE_MEMORY_THRESHOLD_MB", "50"))
+                * 1024
+                * 1024
+            ),
+            output_dir=os.getenv("SCRAPER_PROFILE_DIR", "profiles"),
+        )
+
+    def page(self, url):
+        """Profile the parse and extraction of a single page"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        self._current = _PageProfile(self, url)
+        return self._current
+
+    def stage(self, name):
+        """Attribute time and memory within the current page to an extractor"""
+        if self._current is None:
+            return _NULL_CONTEXT
+        return self._current.stage(name)
+
+    def _finish_page(self, page, failed=False):
+        self._current = None
+
+        record = {
+            "url": page.url,
+            "seconds": round(page.elapsed, 4),
+            "peak_bytes": page.peak_memory,
+            "failed": failed,
+            "stages": {
+                name: {"seconds": round(stats["seconds"], 4), "peak_bytes": stats["peak_bytes"]}
+                for name, stats in page.stages.items()
+            },
+            "profile_file": "",
+        }
+
+        if page.elapsed >= self.time_threshold or page.peak_memory >= self.memory_threshold:
+            record["profile_file"] = self._dump_page(page)
+            logger.warning(
+                f"Slow page {page.url}: {page.elapsed:.2f}s, "
+                f"peak {page.peak_memory / 1024 / 1024:.1f} MB"
+            )
+
+        self.pages.append(record)
+
+    def _dump_page(self, page):
+        """
+        Write the cProfile stats for a page to disk, along with the allocations
+        still live once the page finished (tracemalloc cannot snapshot the peak)
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        parsed = urlparse(page.url)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", parsed.netloc + parsed.path).strip("_")
+        base_path = os.path.join(self.output_dir, f"{slug or 'page'}_{int(time.time())}")
+
+        profile_path = base_path + ".prof"
+        page._profile.dump_stats(profile_path)
+
+        snapshot = tracemalloc.take_snapshot()
+        with open(base_path + ".live-mem.txt", "w", encoding="utf-8") as f:
+            f.write(f"{page.url}\n")
+            f.write(f"peak during page: {page.peak_memory} bytes\n")
+            f.write("allocations still live after the page (not at the peak):\n\n")
+            for stat in snapshot.statistics("lineno")[:25]:
+                f.write(f"{stat}\n")
+
+        return profile_path
+
+    def write_report(self, filename="profile_report.json"):
+        """Write the slowest and heaviest pages with a per-extractor breakdown"""
+        if not self.enabled:
+            return None
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        extractors = {}
+        for record in self.pages:
+            for name, stats in record["stages"].items():
+                totals = extractors.setdefault(
+                    name, {"pages": 0, "seconds": 0.0, "max_seconds": 0.0, "max_peak_bytes": 0}
+                )
+                totals["pages"] += 1
+                totals["seconds"] += stats["seconds"]
+                totals["max_seconds"] = max(totals["max_seconds"], stats["seconds"])
+                totals["max_peak_bytes"] = max(totals["max_peak_bytes"], stats["peak_bytes"])
+
+        report = {
+            "pages_profiled": len(self.pages),
+            "time_threshold": self.time_threshold,
+            "memory_threshold": self.memory_threshold,
+            "slowest": sorted(self.pages, key=lambda r: r["seconds"], reverse=True)[: self.top_n],
+            "heaviest": sorted(self.pages, key=lambda r: r["peak_bytes"], reverse=True)[
+                : self.top_n
+            ],
+            "extractors": dict(
+                sorted(extractors.items(), key=lambda item: item[1]["seconds"], reverse=True)
+            ),
+        }
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        for record in report["slowest"][:3]:
+            logger.info(f"Slowest page: {record['url']} ({record['seconds']:.2f}s)")
+        logger.info(f"Profile report saved to {path}")
+        return path
@@ -14,6 +14,10 @@ from urllib.parse import urljoin, urlparse
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from page_profiler import PageProfiler
+from host_health import HostHealthStore, CLOSED, ParkedDomainError, host_key, is_parked_page
+from news_feeds import NewsFeedTracker
+from companies_mirror import CompaniesMirror, SupabaseCompaniesSource, strong_keys
 
 # Load environment variables
 load_dotenv()
@@ -31,6 +35,15 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Local mirror of the companies table for dedupe and change detection
+companies_mirror = CompaniesMirror.from_env(SupabaseCompaniesSource(supabase))
+
+# Opt-in per-page profiling (enable with SCRAPER_PROFILE=1)
+profiler = PageProfiler.from_env()
+
+# Per-host failure and latency history persisted across runs
+host_health = HostHealthStore.from_env()
+
 # Default headers to avoid blocking
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -40,6 +53,11 @@ HEADERS = {
     "Connection": "keep-alive",
 }
 
+# Feed and sitemap state for incremental news updates
+news_session = requests.Session()
+news_session.headers.update(HEADERS)
+news_tracker = NewsFeedTracker.from_env(news_session)
+
 # Sample URLs for Malaysian social enterprises (replace with actual URLs)
 SAMPLE_URLS = [
     "https://www.ashoka.org/en-my/country/malaysia",
@@ -75,49 +93,54 @@ def extract_company_data(url, soup):
         }
 
         # Extract company name (try multiple selectors)
-        name_selectors = ["h1", ".company-name", ".title", ".name", "title"]
-        for selector in name_selectors:
-            element = soup.select_one(selector)
-            if element and element.get_text(strip=True):
-                company_data["company_name"] = clean_text(element.get_text())
-                break
-
-        # Extract description
-        desc_selectors = [
-            ".description",
-            ".about",
-            ".summary",
-            'meta[name="description"]',
-        ]
-        for selector in desc_selectors:
-            if selector.startswith("meta"):
-                element = soup.select_one(selector)
-                if element and element.get("content"):
-                    company_data["description"] = clean_text(element.get("content"))
-                    break
-            else:
+        with profiler.stage("company_name"):
+            name_selectors = ["h1", ".company-name", ".title", ".name", "title"]
+            for selector in name_selectors:
                 element = soup.select_one(selector)
                 if element and element.get_text(strip=True):
-                    company_data["description"] = clean_text(element.get_text())
+                    company_data["company_name"] = clean_text(element.get_text())
                     break
 
+        # Extract description
+        with profiler.stage("description"):
+            desc_selectors = [
+                ".description",
+                ".about",
+                ".summary",
+                'meta[name="description"]',
+            ]
+            for selector in desc_selectors:
+                if selector.startswith("meta"):
+                    element = soup.select_one(selector)
+                    if element and element.get("content"):
+                        company_data["description"] = clean_text(element.get("content"))
+                        break
+                else:
+                    element = soup.select_one(selector)
+                    if element and element.get_text(strip=True):
+                        company_data["description"] = clean_text(element.get_text())
+                        break
+
         # Extract email
-        email_elements = soup.find_all(
-            "a", href=lambda x: x and x.startswith("mailto:")
-        )
-        if email_elements:
-            company_data["email"] = email_elements[0]["href"].replace("mailto:", "")
+        with profiler.stage("email"):
+            email_elements = soup.find_all(
+                "a", href=lambda x: x and x.startswith("mailto:")
+            )
+            if email_elements:
+                company_data["email"] = email_elements[0]["href"].replace("mailto:", "")
 
         # Extract contact info
-        contact_selectors = [".contact", ".contact-info", ".address"]
-        for selector in contact_selectors:
-            element = soup.select_one(selector)
-            if element and element.get_text(strip=True):
-                company_data["contact_info"] = clean_text(element.get_text())
-                break
+        with profiler.stage("contact_info"):
+            contact_selectors = [".contact", ".contact-info", ".address"]
+            for selector in contact_selectors:
+                element = soup.select_one(selector)
+                if element and element.get_text(strip=True):
+                    company_data["contact_info"] = clean_text(element.get_text())
+                    break
 
         # Determine sector based on keywords in content
-        content_text = soup.get_text().lower()
+        with profiler.stage("page_text"):
+            content_text = soup.get_text().lower()
         sector_keywords = {
             "Environmental Technology": [
                 "environment",
@@ -146,10 +169,11 @@ def extract_company_data(url, soup):
             ],
         }
 
-        for sector, keywords in sector_keywords.items():
-            if any(keyword in content_text for keyword in keywords):
-                company_data["sector"] = sector
-                break
+        with profiler.stage("sector"):
+            for sector, keywords in sector_keywords.items():
+                if any(keyword in content_text for keyword in keywords):
+                    company_data["sector"] = sector
+                    break
 
         if not company_data["sector"]:
             company_data["sector"] = "Social Innovation"
@@ -166,13 +190,29 @@ def scrape_url(url):
     try:
         print(f"Scraping: {url}")
 
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-        company_data = extract_company_data(url, soup)
+        timeout = host_health.timeout_for(url, default=10)
+        start = time.perf_counter()
+        try:
+            response = requests.get(url, headers=HEADERS, timeout=timeout)
+            response.raise_for_status()
+            if is_parked_page(response.text):
+                raise ParkedDomainError(f"{url} is a parked domain")
+        except requests.RequestException as e:
+            host_health.record_failure(url, e)
+            raise
+        host_health.record_success(url, time.perf_counter() - start)
+
+        with profiler.page(url):
+            with profiler.stage("parse"):
+                soup = BeautifulSoup(response.content, "html.parser")
+            company_data = extract_company_data(url, soup)
+            with profiler.stage("feed_discovery"):
+                news_tracker.discover_from_page(url, soup)
 
         if company_data and company_data["company_name"]:
+            # Dated news items come from the site's feeds or sitemap
+            company_data["news_items"] = news_tracker.fetch_new_items(url)
+            company_data["related_news_updates"] = news_tracker.summarize(url)
             return company_data
         else:
             print(f"No valid company data found at {url}")
@@ -187,24 +227,94 @@ def scrape_url(url):
 
 
 def save_to_supabase(companies_data):
-    """Save scraped data to Supabase"""
+    """Save scraped data to Supabase, skipping companies that are already up to date"""
     try:
-        print(f"Saving {len(companies_data)} companies to Supabase...")
+        companies_mirror.sync()
+
+        new_companies, changed_companies, unchanged = [], [], 0
+        # Strong keys of the new companies queued so far in this run
+        queued = {}
+        for company in companies_data:
+            status, company_id, changes = companies_mirror.classify(company)
+            if status == "new":
+                keys = strong_keys(company)
+                duplicate = next((queued[key] for key in keys if key in queued), None)
+                if duplicate is None:
+                    queued.update((key, company) for key in keys)
+                    new_companies.append(company)
+                    continue
+                print(
+                    f"Skipping {company['company_name']}: duplicate of "
+                    f"{duplicate['company_name']} in this run"
+                )
+                # Items from the same site are stored with the kept record
+                if host_key(company["website_url"]) != host_key(duplicate["website_url"]):
+                    news_tracker.forget_items(
+                        company["website_url"], company.get("news_items", [])
+                    )
+                continue
+
+            if status in ("name_match", "weak_match"):
+                print(
+                    f"Not updating {company['company_name']}: matches company "
+                    f"{company_id} by {'name' if status == 'name_match' else 'domain'} only"
+                )
+                # The match is a guess, so its news is neither stored nor
+                # marked seen and is offered again once the company is resolved
+                news_tracker.forget_items(company["website_url"], company.get("news_items", []))
+                continue
+
+            if status == "changed":
+                changed_companies.append((company_id, company, changes))
+            else:
+                unchanged += 1
+            # Matched companies may still have fresh news items
+            save_news_items(
+                [company], [{"id": company_id, "website_url": company["website_url"]}]
+            )
+
+        print(
+            f"Saving {len(new_companies)} new and {len(changed_companies)} changed "
+            f"companies to Supabase ({unchanged} unchanged)..."
+        )
 
         # Insert data in batches to avoid rate limits
         batch_size = 10
-        for i in range(0, len(companies_data), batch_size):
-            batch = companies_data[i : i + batch_size]
-
-            response = supabase.table("companies").insert(batch).execute()
+        for i in range(0, len(new_companies), batch_size):
+            batch = new_companies[i : i + batch_size]
+            # Timestamps are assigned by the database so the mirror's sync
+            # cursor never runs ahead of the server clock
+            rows = [
+                {
+                    key: value
+                    for key, value in company.items()
+                    if key not in ("news_items", "created_at", "updated_at")
+                }
+                for company in batch
+            ]
+
+            response = supabase.table("companies").insert(rows).execute()
 
             if response.data:
                 print(f"Successfully saved batch {i//batch_size + 1}")
+                companies_mirror.record_saved(response.data)
+                save_news_items(batch, response.data)
             else:
                 print(f"Error saving batch {i//batch_size + 1}")
 
             time.sleep(1)  # Rate limiting
 
+        # Only the non-empty fields that differ are written to matched rows
+        for company_id, company, changes in changed_companies:
+            response = (
+                supabase.table("companies").update(changes).eq("id", company_id).execute()
+            )
+
+            if response.data:
+                companies_mirror.record_saved(response.data)
+            else:
+                print(f"Error updating {company['company_name']}")
+
         print(f"Successfully saved all {len(companies_data)} companies!")
         return True
 
@@ -213,6 +323,83 @@ def save_to_supabase(companies_data):
         return False
 
 
+def save_news_items(companies, saved_rows):
+    """Save each company's news items as separate rows in company_news"""
+    company_ids = {row["website_url"]: row["id"] for row in saved_rows}
+
+    news_rows = []
+    for company in companies:
+        company_id = company_ids.get(company["website_url"])
+        if not company_id:
+            continue
+        for item in company.get("news_items", []):
+            news_rows.append(
+                {
+                    "company_id": company_id,
+                    "title": item["title"],
+                    "url": item["url"],
+                    "published_at": item["published"] or None,
+                    "summary": item["summary"],
+                    "source": item["source"],
+                }
+            )
+
+    if news_rows:
+        supabase.table("company_news").upsert(
+            news_rows, on_conflict="company_id,url", ignore_duplicates=True
+        ).execute()
+        print(f"Saved {len(news_rows)} news items")
+
+
+def refresh_news(urls):
+    """
+    Store new news items from feeds and sitemaps for companies already in
+    Supabase, without re-scraping their pages
+    """
+    try:
+        companies_mirror.sync()
+
+        saved = 0
+        for url in urls:
+            if host_health.state(url) != CLOSED:
+                continue
+
+            # Unknown companies and pages that only share a domain with one are
+            # left to the full scrape, so their items are never marked as seen
+            # before they are stored
+            company = companies_mirror.find({"website_url": url}, strong_only=True)
+            if company is None:
+                print(f"Skipping news for {url}: no company owns this site")
+                continue
+
+            items = news_tracker.fetch_new_items(url)
+            if not items:
+                continue
+
+            save_news_items(
+                [{"website_url": url, "news_items": items}],
+                [{"id": company["id"], "website_url": url}],
+            )
+            response = (
+                supabase.table("companies")
+                .update({"related_news_updates": news_tracker.summarize(url)})
+                .eq("id", company["id"])
+                .execute()
+            )
+            if response.data:
+                companies_mirror.record_saved(response.data)
+
+            news_tracker.save()
+            saved += len(items)
+
+        print(f"Saved {saved} new news items")
+        return saved
+
+    except Exception as e:
+        print(f"Error refreshing news: {e}")
+        return 0
+
+
 def create_mock_data():
     """Create mock data for testing when scraping is not available"""
     mock_companies = [
@@ -263,15 +450,29 @@ def main():
     """Main scraper function"""
     print("Starting ASBhive Ecosystem Data Scraper...")
 
+    # Cheap refresh: only poll feeds and sitemaps of known companies
+    if "--news-only" in sys.argv[1:]:
+        refresh_news(SAMPLE_URLS)
+        return
+
     companies_data = []
 
     # Option 1: Try to scrape real URLs
     print("Attempting to scrape real URLs...")
-    for url in SAMPLE_URLS[:3]:  # Limit to first 3 URLs for testing
-        company_data = scrape_url(url)
-        if company_data:
-            companies_data.append(company_data)
-        time.sleep(2)  # Be respectful to servers
+    try:
+        for url in host_health.prioritize(SAMPLE_URLS[:3]):  # Limit to first 3 URLs for testing
+            if not host_health.allow_request(url):
+                print(f"Skipping {url}: host circuit is open")
+                continue
+            company_data = scrape_url(url)
+            if company_data:
+                companies_data.append(company_data)
+            time.sleep(2)  # Be respectful to servers
+    finally:
+        # Keep health updates even if the run crashes part way
+        host_health.save()
+
+    profiler.write_report()
 
     # Option 2: Use mock data if no real data was scraped
     if not companies_data:
@@ -282,6 +483,8 @@ def main():
     if companies_data:
         success = save_to_supabase(companies_data)
         if success:
+            # Only mark news items as seen once they are stored
+            news_tracker.save()
             print(f"\n✅ Scraping completed successfully!")
             print(f"📊 Total companies saved: {len(companies_data)}")
         else:
@@ -0,0 +1,226 @@
+"""
+Tests for the local companies mirror.
+
+Run from the repository root with: python -m pytest scripts
+"""
+
+import sqlite3
+
+import pytest
+
+from companies_mirror import (
+    MIRROR_COLUMNS,
+    CompaniesMirror,
+    PostgresCompaniesSource,
+    strong_keys,
+)
+
+
+def make_company(company_id, updated_at, **fields):
+    company = {column: "" for column in MIRROR_COLUMNS}
+    company.update(
+        {
+            "id": company_id,
+            "company_name": f"Company {company_id} Sdn Bhd",
+            "email": f"info@company{company_id}.my",
+            "website_url": f"https://www.company{company_id}.my/",
+            "sector": "Food",
+            "description": f"Company {company_id} description",
+            "created_at": "2025-01-01T00:00:00+00:00",
+            "updated_at": updated_at,
+        }
+    )
+    company.update(fields)
+    return company
+
+
+def timestamp(seconds):
+    return f"2025-01-01T00:{seconds // 60:02d}:{seconds % 60:02d}+00:00"
+
+
+class FakeSource:
+    """In-memory companies table paged by (updated_at, id) like the real sources"""
+
+    def __init__(self, rows):
+        self.rows = {row["id"]: row for row in rows}
+        self.calls = []
+
+    def fetch_page(self, after_updated_at, after_id, limit):
+        self.calls.append((after_updated_at, after_id, limit))
+        rows = sorted(self.rows.values(), key=lambda row: (row["updated_at"], row["id"]))
+        if after_updated_at:
+            rows = [
+                row
+                for row in rows
+                if (row["updated_at"], row["id"]) > (after_updated_at, after_id)
+            ]
+        return [dict(row) for row in rows[:limit]]
+
+
+class SqlitePostgresConnection:
+    """
+    Minimal DB-API stand-in for a local Postgres connection, backed by SQLite.
+    Translates psycopg's %s placeholders and supports `with conn.cursor()`.
+    """
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+
+    def cursor(self):
+        return _SqliteCursor(self.db.cursor())
+
+
+class _SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(sql.replace("%s", "?"), params)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+@pytest.fixture
+def mirror_for():
+    mirrors = []
+
+    def build(source, **kwargs):
+        mirror = CompaniesMirror(source, path=":memory:", **kwargs)
+        mirrors.append(mirror)
+        return mirror
+
+    yield build
+    for mirror in mirrors:
+        mirror.close()
+
+
+def test_sync_pages_through_all_rows_with_keyset_cursor(mirror_for):
+    # Several rows share a timestamp so paging must tie-break on id
+    rows = [make_company(i, timestamp(i // 3)) for i in range(1, 26)]
+    source = FakeSource(rows)
+    mirror = mirror_for(source, page_size=10, lookback=0)
+
+    assert mirror.sync() == 25
+    assert mirror.count() == 25
+    # Three pages: 10 + 10 + 5 (the short page ends the sync)
+    assert len(source.calls) == 3
+    assert source.calls[1][:2] == (timestamp(10 // 3), 10)
+
+    # Nothing changed upstream, so an incremental sync applies nothing
+    assert mirror.sync() == 0
+
+
+def test_sync_picks_up_updates_and_late_commits_within_lookback(mirror_for):
+    source = FakeSource([make_company(i, timestamp(i * 10)) for i in range(1, 4)])
+    mirror = mirror_for(source, page_size=10, lookback=60)
+    mirror.sync()
+
+    # An ordinary update moves the row past the cursor
+    source.rows[1] = make_company(1, timestamp(100), description="Updated")
+    # A row committed late with a timestamp just behind the cursor
+    source.rows[4] = make_company(4, timestamp(25))
+    mirror.sync()
+
+    assert mirror.find({"email": "info@company1.my"})["description"] == "Updated"
+    assert mirror.find({"email": "info@company4.my"}) is not None
+    assert mirror.count() == 4
+
+
+def test_classify_uses_strong_keys_and_never_clears_fields(mirror_for):
+    source = FakeSource([make_company(1, timestamp(1)), make_company(2, timestamp(2))])
+    mirror = mirror_for(source)
+    mirror.sync()
+
+    assert mirror.classify({"company_name": "Brand New", "email": "hi@new.my"}) == (
+        "new",
+        None,
+        {},
+    )
+
+    same = make_company(1, timestamp(1), website_url="company1.my")
+    assert mirror.classify(same) == ("unchanged", 1, {})
+
+    # Empty scraped fields are not reported as changes
+    scraped = {
+        "company_name": "",
+        "email": "INFO@company2.my",
+        "website_url": "",
+        "sector": "Education",
+    }
+    assert mirror.classify(scraped) == ("changed", 2, {"sector": "Education"})
+
+    # A name-only match is never trusted for updates
+    assert mirror.classify({"company_name": "COMPANY 1 BHD"}) == ("name_match", 1, {})
+
+
+def test_domain_matches_are_strong_only_between_site_roots(mirror_for):
+    source = FakeSource(
+        [
+            make_company(1, timestamp(1)),
+            make_company(
+                2,
+                timestamp(2),
+                email="",
+                website_url="https://www.directory.my/members/company-2",
+            ),
+            make_company(3, timestamp(3), email="", website_url="https://facebook.com/company3"),
+        ]
+    )
+    mirror = mirror_for(source)
+    mirror.sync()
+
+    root = {"company_name": "Other", "website_url": "http://company1.my", "sector": "Retail"}
+    assert mirror.classify(root) == ("changed", 1, {"company_name": "Other", "sector": "Retail"})
+
+    # A deeper page on a known company's site is only a guess
+    page = {"company_name": "Other", "website_url": "https://company1.my/partners/acme"}
+    assert mirror.classify(page) == ("weak_match", 1, {})
+    assert mirror.find(page, strong_only=True) is None
+
+    # The stored row points at a directory page, so a root URL is still weak
+    directory = {"company_name": "Other", "website_url": "https://directory.my/"}
+    assert mirror.classify(directory) == ("weak_match", 2, {})
+
+    # Shared hosts never match by domain
+    shared = {"company_name": "Other", "website_url": "https://www.facebook.com/"}
+    assert mirror.classify(shared) == ("new", None, {})
+
+
+def test_strong_keys_identify_duplicates():
+    assert strong_keys({"email": "Info@Acme.my ", "website_url": "https://www.acme.my/"}) == [
+        ("email_norm", "info@acme.my"),
+        ("domain_norm", "acme.my"),
+    ]
+    assert strong_keys({"email": "", "website_url": "https://acme.my/about"}) == []
+    assert strong_keys({"website_url": "https://linktr.ee/"}) == []
+
+
+def test_postgres_source_syncs_from_local_stand_in(mirror_for):
+    connection = SqlitePostgresConnection()
+    connection.db.execute(
+        f"CREATE TABLE companies ({', '.join(MIRROR_COLUMNS)}, password_hash)"
+    )
+    for i in range(1, 8):
+        row = make_company(i, timestamp(i // 2))
+        connection.db.execute(
+            f"INSERT INTO companies VALUES ({', '.join('?' * (len(MIRROR_COLUMNS) + 1))})",
+            [row[column] for column in MIRROR_COLUMNS] + ["secret"],
+        )
+
+    mirror = mirror_for(PostgresCompaniesSource(connection), page_size=3, lookback=0)
+
+    assert mirror.sync() == 7
+    assert mirror.classify(make_company(5, timestamp(2)))[:2] == ("unchanged", 5)
+    assert "password_hash" not in mirror.find({"email": "info@company5.my"})
@@ -0,0 +1,159 @@
+"""
+Tests for host health tracking and the circuit breaker.
+
+Run from the repository root with: python -m pytest scripts
+"""
+
+import pytest
+import requests
+
+import host_health
+from host_health import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    HostHealthStore,
+    ParkedDomainError,
+    is_host_failure,
+    is_parked_page,
+)
+
+URL = "https://www.example.my/about"
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"{status_code} error", response=response)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(host_health.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return HostHealthStore(
+        path=str(tmp_path / "host_health.json"),
+        failure_threshold=2,
+        base_cooldown=100,
+        max_cooldown=350,
+    )
+
+
+def test_is_host_failure_only_blames_the_host():
+    assert is_host_failure(requests.ConnectionError("refused"))
+    assert is_host_failure(requests.ReadTimeout("slow"))
+    assert is_host_failure(http_error(503))
+    assert is_host_failure(requests.HTTPError("no response"))
+    assert is_host_failure(ParkedDomainError("parked"))
+
+    assert not is_host_failure(http_error(404))
+    assert not is_host_failure(http_error(429))
+    assert not is_host_failure(requests.TooManyRedirects("loop"))
+
+
+def test_parked_pages_are_detected():
+    assert is_parked_page("<html><h1>This domain is for sale!</h1></html>")
+    assert is_parked_page('<script src="https://www.sedoparking.com/js"></script>')
+    assert not is_parked_page("<html><h1>Kedai Kopi Sdn Bhd</h1></html>")
+    assert not is_parked_page(None)
+
+
+def test_cooldown_backs_off_exponentially_and_is_capped(store, clock):
+    failure = requests.ConnectionError("refused")
+
+    store.record_failure(URL, failure)
+    assert store.state(URL) == CLOSED
+
+    cooldowns = []
+    for _ in range(4):
+        store.record_failure(URL, failure)
+        assert store.state(URL) == OPEN
+        cooldowns.append(store.hosts["example.my"]["cooldown"])
+    assert cooldowns == [100, 200, 350, 350]
+
+    # A 4xx means the host answered, which closes the circuit again
+    store.record_failure(URL, http_error(404))
+    assert store.state(URL) == CLOSED
+    assert store.hosts["example.my"]["consecutive_failures"] == 0
+
+
+def test_half_open_lets_a_single_probe_through(store, clock):
+    for _ in range(2):
+        store.record_failure(URL, requests.ConnectionError("refused"))
+    assert not store.allow_request(URL)
+
+    clock.now += 100
+    assert store.state(URL) == HALF_OPEN
+    assert store.allow_request(URL)
+    assert not store.allow_request("https://example.my/contact")
+
+    store.record_success(URL, 0.4)
+    assert store.state(URL) == CLOSED
+    assert store.allow_request(URL)
+
+
+def test_failed_probe_reopens_with_longer_cooldown(store, clock):
+    for _ in range(2):
+        store.record_failure(URL, requests.ConnectionError("refused"))
+    clock.now += 100
+
+    assert store.allow_request(URL)
+    store.record_failure(URL, requests.ConnectionError("still refused"))
+
+    assert store.state(URL) == OPEN
+    assert store.hosts["example.my"]["cooldown"] == 200
+
+
+def test_timeout_follows_latency_history(store):
+    assert store.timeout_for(URL, default=30) == 30
+
+    for latency in [1.0, 2.0, 2.0, 3.0]:
+        store.record_success(URL, latency)
+    assert store.timeout_for(URL, default=30) == 9.0
+    assert store.timeout_for(URL, default=6) == 6
+
+
+def test_read_timeout_under_shortened_timeout_is_not_a_host_failure(store):
+    for _ in range(3):
+        store.record_success(URL, 2.0)
+    assert store.timeout_for(URL, default=30) == 6.0
+
+    for _ in range(3):
+        store.record_failure(URL, requests.ReadTimeout("slow"))
+
+    entry = store.hosts["example.my"]
+    assert entry["consecutive_failures"] == 0
+    assert store.state(URL) == CLOSED
+    # The waits feed back into the history, so the timeout grows again
+    assert entry["latencies"][-3:] == [6.0, 6.0, 6.0]
+    assert store.timeout_for(URL, default=30) == 18.0
+
+
+def test_timeout_at_the_default_still_counts(store):
+    store.timeout_for(URL, default=10)
+    store.record_failure(URL, requests.ReadTimeout("slow"))
+    store.record_failure(URL, requests.ConnectTimeout("unreachable"))
+
+    assert store.hosts["example.my"]["consecutive_failures"] == 2
+    assert store.state(URL) == OPEN
+
+
+def test_records_survive_a_reload(store):
+    store.record_success(URL, 1.5)
+    store.save()
+
+    reloaded = HostHealthStore(path=store.path)
+    assert reloaded.latency_percentiles(URL) == {"p50": 1.5, "p95": 1.5}
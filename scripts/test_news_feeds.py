@@ -0,0 +1,232 @@
+"""
+Tests for feed and sitemap news tracking.
+
+Run from the repository root with: python -m pytest scripts
+"""
+
+import pytest
+import requests
+
+from news_feeds import NewsFeedTracker, parse_feed, parse_sitemap
+
+SITE = "https://www.example.my/"
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <title>Example news</title>
+  <item>
+    <title>Second &lt;b&gt;launch&lt;/b&gt;</title>
+    <link>/news/second</link>
+    <pubDate>Tue, 02 Sep 2025 08:00:00 +0800</pubDate>
+    <description>&lt;p&gt;More &amp;amp; better&lt;/p&gt;</description>
+    <guid>post-2</guid>
+  </item>
+  <item>
+    <title>First launch</title>
+    <link>https://www.example.my/news/first</link>
+    <pubDate>Mon, 01 Sep 2025 08:00:00 GMT</pubDate>
+  </item>
+  <item>
+    <title>Undated</title>
+    <link>https://www.example.my/news/undated</link>
+  </item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <title>Atom post</title>
+    <link rel="edit" href="https://www.example.my/edit/1"/>
+    <link href="https://www.example.my/blog/atom-post"/>
+    <updated>2025-09-03T10:00:00Z</updated>
+    <summary>Short summary</summary>
+    <id>tag:example.my,2025:1</id>
+  </entry>
+</feed>"""
+
+XHTML_404 = b"""<?xml version="1.0"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><body><item>Not found</item></body></html>"""
+
+SITEMAP = b"""<?xml version="1.0"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.example.my/news/new-outlet-opens</loc><lastmod>2025-09-05</lastmod></url>
+  <url><loc>https://www.example.my/about</loc><lastmod>2025-09-05</lastmod></url>
+  <url><loc>https://www.example.my/blog/no-date</loc></url>
+</urlset>"""
+
+SITEMAP_INDEX = b"""<?xml version="1.0"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://www.example.my/post-sitemap.xml</loc><lastmod>2025-09-05</lastmod></sitemap>
+</sitemapindex>"""
+
+
+class FakeResponse:
+    def __init__(self, url, status_code=200, content=b"", headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class FakeSession:
+    """Serves fixed documents by URL; anything else is a 404"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.responses = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        status_code, content = self.documents.get(url, (404, b""))
+        response = FakeResponse(url, status_code, content, {"ETag": f'"{len(content)}"'})
+        self.responses.append(response)
+        return response
+
+
+@pytest.fixture
+def tracker_for(tmp_path):
+    def build(documents, **kwargs):
+        session = FakeSession(documents)
+        return NewsFeedTracker(session, state_path=str(tmp_path / "news_state.json"), **kwargs)
+
+    return build
+
+
+def test_parse_feed_reads_rss_and_atom():
+    rss = parse_feed(RSS, "https://www.example.my/feed")
+    assert [item["title"] for item in rss] == ["Second launch", "First launch", "Undated"]
+    assert rss[0]["url"] == "https://www.example.my/news/second"
+    assert rss[0]["published"] == "2025-09-02T00:00:00+00:00"
+    assert rss[0]["summary"] == "More & better"
+    assert rss[0]["id"] == "post-2"
+    assert rss[1]["id"] == "https://www.example.my/news/first"
+    assert rss[2]["published"] == ""
+
+    atom = parse_feed(ATOM)
+    assert atom == [
+        {
+            "title": "Atom post",
+            "url": "https://www.example.my/blog/atom-post",
+            "published": "2025-09-03T10:00:00+00:00",
+            "summary": "Short summary",
+            "source": "atom",
+            "id": "tag:example.my,2025:1",
+        }
+    ]
+
+
+def test_parse_feed_rejects_xml_that_is_not_a_feed():
+    with pytest.raises(ValueError):
+        parse_feed(XHTML_404)
+
+
+def test_parse_sitemap_splits_pages_and_child_sitemaps():
+    pages, children = parse_sitemap(SITEMAP)
+    assert pages[0] == (
+        "https://www.example.my/news/new-outlet-opens",
+        "2025-09-05T00:00:00+00:00",
+    )
+    assert pages[2] == ("https://www.example.my/blog/no-date", "")
+    assert children == []
+
+    pages, children = parse_sitemap(SITEMAP_INDEX)
+    assert pages == []
+    assert children == [
+        ("https://www.example.my/post-sitemap.xml", "2025-09-05T00:00:00+00:00")
+    ]
+
+    with pytest.raises(ValueError):
+        parse_sitemap(XHTML_404)
+
+
+def test_fetch_new_items_only_returns_unseen_dated_items(tracker_for):
+    tracker = tracker_for({"https://www.example.my/feed": (200, RSS)})
+
+    first = tracker.fetch_new_items(SITE)
+    assert [item["id"] for item in first] == ["post-2", "https://www.example.my/news/first"]
+    site = tracker.sites["example.my"]
+    assert site["last_seen"] == "2025-09-02T00:00:00+00:00"
+    assert site["feeds"] == ["https://www.example.my/feed"]
+
+    # Same feed again: everything is already seen
+    assert tracker.fetch_new_items(SITE) == []
+
+    # An unseen item older than last_seen is ignored, a newer one is returned
+    site["seen_ids"].remove("https://www.example.my/news/first")
+    newer = RSS.replace(b"<guid>post-2</guid>", b"<guid>post-3</guid>").replace(
+        b"Tue, 02 Sep 2025", b"Wed, 03 Sep 2025"
+    )
+    tracker.session.documents["https://www.example.my/feed"] = (200, newer)
+    assert [item["id"] for item in tracker.fetch_new_items(SITE)] == ["post-3"]
+    assert site["last_seen"] == "2025-09-03T00:00:00+00:00"
+    assert tracker.summarize(SITE, limit=2) == (
+        "Second launch (2025-09-03); Second launch (2025-09-02)"
+    )
+
+
+def test_forgotten_items_are_offered_again(tracker_for):
+    tracker = tracker_for({"https://www.example.my/feed": (200, RSS)})
+    tracker.fetch_new_items(SITE)
+    site = tracker.sites["example.my"]
+
+    newer = RSS.replace(b"<guid>post-2</guid>", b"<guid>post-3</guid>").replace(
+        b"Tue, 02 Sep 2025", b"Wed, 03 Sep 2025"
+    )
+    tracker.session.documents["https://www.example.my/feed"] = (200, newer)
+    items = tracker.fetch_new_items(SITE)
+    assert [item["id"] for item in items] == ["post-3"]
+
+    tracker.forget_items(SITE, items)
+    assert "post-3" not in site["seen_ids"]
+    assert [item["id"] for item in site["recent"]][0] == "post-2"
+    assert site["last_seen"] == "2025-09-02T00:00:00+00:00"
+    assert [item["id"] for item in tracker.fetch_new_items(SITE)] == ["post-3"]
+
+
+def test_soft_404_feed_falls_back_to_sitemap(tracker_for):
+    tracker = tracker_for(
+        {
+            "https://www.example.my/feed": (200, XHTML_404),
+            "https://www.example.my/sitemap.xml": (200, SITEMAP),
+        }
+    )
+
+    items = tracker.fetch_new_items(SITE)
+
+    assert tracker.sites["example.my"]["feeds"] == []
+    assert [item["url"] for item in items] == ["https://www.example.my/news/new-outlet-opens"]
+    assert items[0]["title"] == "New outlet opens"
+
+
+def test_streamed_responses_are_always_closed(tracker_for):
+    tracker = tracker_for(
+        {
+            "https://www.example.my/feed": (304, b""),
+            "https://www.example.my/rss.xml": (500, b""),
+            "https://www.example.my/atom.xml": (200, b"x" * 100),
+        },
+        max_bytes=10,
+    )
+
+    tracker.fetch_new_items(SITE)
+
+    assert tracker.session.responses
+    assert all(response.closed for response in tracker.session.responses)
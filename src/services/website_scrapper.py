@@ -3,9 +3,39 @@ from bs4 import BeautifulSoup
 import json
 import time
 import re
+import os
+import sys
+import importlib
 from urllib.parse import urljoin, urlparse
 import logging
 
+SCRIPTS_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts")
+)
+
+
+def import_scraper_helpers(*module_names):
+    """
+    Import helper modules shared with scripts/scraper.py from the scripts
+    directory, only putting it on sys.path for the duration of the import
+    """
+    sys.path.insert(0, SCRIPTS_DIR)
+    try:
+        return [importlib.import_module(name) for name in module_names]
+    finally:
+        sys.path.remove(SCRIPTS_DIR)
+
+
+_page_profiler, _host_health, _news_feeds = import_scraper_helpers(
+    "page_profiler", "host_health", "news_feeds"
+)
+PageProfiler = _page_profiler.PageProfiler
+HostHealthStore = _host_health.HostHealthStore
+CLOSED = _host_health.CLOSED
+ParkedDomainError = _host_health.ParkedDomainError
+is_parked_page = _host_health.is_parked_page
+NewsFeedTracker = _news_feeds.NewsFeedTracker
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -14,7 +44,7 @@ logger = logging.getLogger(__name__)
 
 
 class SocialEnterpriseScraper:
-    def __init__(self):
+    def __init__(self, profiler=None, host_health=None, news_tracker=None):
         self.session = requests.Session()
         self.session.headers.update(
             {
@@ -22,6 +52,9 @@ class SocialEnterpriseScraper:
             }
         )
         self.scraped_companies = []
+        self.profiler = profiler or PageProfiler.from_env()
+        self.host_health = host_health or HostHealthStore.from_env()
+        self.news_tracker = news_tracker or NewsFeedTracker.from_env(self.session)
 
         # Target websites and directories for Malaysian social enterprises
         self.target_sources = [
@@ -47,56 +80,93 @@ class SocialEnterpriseScraper:
         Extract company information from a given URL using Beautiful Soup
         """
         try:
+            if not self.host_health.allow_request(url):
+                logger.warning(f"Skipping {url}: host circuit is open")
+                return None
+
             logger.info(f"Scraping {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Initialize company data structure
-            company_data = {
-                "company_name": "",
-                "email": "",
-                "website_url": url,
-                "sector": "",
-                "description": "",
-                "contact_info": "",
-                "social_enterprise_status": "Yes",  # Assumed for sources
-                "related_news_updates": "",
-                "program_participation": "",
-            }
+            timeout = self.host_health.timeout_for(url, default=30)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=timeout)
+                response.raise_for_status()
+                if is_parked_page(response.text):
+                    raise ParkedDomainError(f"{url} is a parked domain")
+            except requests.RequestException as e:
+                self.host_health.record_failure(url, e)
+                raise
+            self.host_health.record_success(url, time.perf_counter() - start)
+
+            with self.profiler.page(url):
+                company_data = self.parse_company_page(response.text, url)
+
+            # Dated news items come from the site's feeds or sitemap
+            company_data["news_items"] = self.news_tracker.fetch_new_items(url)
+            company_data["related_news_updates"] = (
+                self.news_tracker.summarize(url)
+                or company_data["related_news_updates"]
+            )
+
+            time.sleep(2)  # Be respectful to servers
+            return company_data
+
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error parsing {url}: {e}")
+            return None
+
+    def parse_company_page(self, html, url):
+        """Parse a fetched page and run every extractor over it"""
+        profiler = self.profiler
+        with profiler.stage("parse"):
+            soup = BeautifulSoup(html, "html.parser")
+
+        # Initialize company data structure
+        company_data = {
+            "company_name": "",
+            "email": "",
+            "website_url": url,
+            "sector": "",
+            "description": "",
+            "contact_info": "",
+            "social_enterprise_status": "Yes",  # Assumed for sources
+            "related_news_updates": "",
+            "program_participation": "",
+        }
 
-            # Extract company name
+        # Extract company name
+        with profiler.stage("company_name"):
             company_data["company_name"] = self.extract_company_name(soup, url)
 
-            # Extract description
+        # Extract description
+        with profiler.stage("description"):
             company_data["description"] = self.extract_description(soup)
 
-            # Extract contact information
+        # Extract contact information
+        with profiler.stage("contact_info"):
             contact_info = self.extract_contact_info(soup)
-            company_data["email"] = contact_info.get("email", "")
-            company_data["contact_info"] = contact_info.get("full_contact", "")
+        company_data["email"] = contact_info.get("email", "")
+        company_data["contact_info"] = contact_info.get("full_contact", "")
 
-            # Extract sector information
+        # Extract sector information
+        with profiler.stage("sector"):
             company_data["sector"] = self.extract_sector(
                 soup, company_data["description"]
             )
 
-            # Extract news and program information
+        # Extract news and program information
+        with profiler.stage("news_updates"):
             company_data["related_news_updates"] = self.extract_news_updates(soup)
-            company_data["program_participation"] = self.extract_program_participation(
-                soup
+        with profiler.stage("feed_discovery"):
+            self.news_tracker.discover_from_page(url, soup)
+        with profiler.stage("program_participation"):
+            company_data["program_participation"] = (
+                self.extract_program_participation(soup)
             )
 
-            time.sleep(2)  # Be respectful to servers
-            return company_data
-
-        except requests.RequestException as e:
-            logger.error(f"Error fetching {url}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error parsing {url}: {e}")
-            return None
+        return company_data
 
     def extract_company_name(self, soup, url):
         """Extract company name from various HTML elements"""
@@ -366,27 +436,60 @@ class SocialEnterpriseScraper:
         """Scrape all target companies"""
         logger.info(f"Starting scrape of {len(self.target_sources)} companies")
 
-        for url in self.target_sources:
-            try:
-                company_data = self.extract_company_info(url)
-                if company_data:
-                    self.scraped_companies.append(company_data)
-                    logger.info(f"Successfully scraped: {company_data['company_name']}")
-                else:
-                    logger.warning(f"Failed to scrape: {url}")
-            except Exception as e:
-                logger.error(f"Error processing {url}: {e}")
-                continue
+        try:
+            for url in self.host_health.prioritize(self.target_sources):
+                try:
+                    company_data = self.extract_company_info(url)
+                    if company_data:
+                        self.scraped_companies.append(company_data)
+                        logger.info(
+                            f"Successfully scraped: {company_data['company_name']}"
+                        )
+                    else:
+                        logger.warning(f"Failed to scrape: {url}")
+                except Exception as e:
+                    logger.error(f"Error processing {url}: {e}")
+                    continue
+        finally:
+            # Keep health updates even if the run crashes part way
+            self.host_health.save()
 
         logger.info(
             f"Scraping completed. Collected {len(self.scraped_companies)} companies"
         )
+        self.profiler.write_report()
         return self.scraped_companies
 
+    def refresh_news_updates(self, filename="scraped_companies.json"):
+        """
+        Add new feed and sitemap news to previously saved companies without
+        re-fetching their homepages
+        """
+        with open(filename, "r", encoding="utf-8") as f:
+            self.scraped_companies = json.load(f)
+
+        new_items = 0
+        for company in self.scraped_companies:
+            url = company["website_url"]
+            if self.host_health.state(url) != CLOSED:
+                continue
+
+            items = self.news_tracker.fetch_new_items(url)
+            if items:
+                company["news_items"] = items + company.get("news_items", [])
+                company["related_news_updates"] = self.news_tracker.summarize(url)
+                new_items += len(items)
+
+        logger.info(f"Collected {new_items} new news items")
+        self.save_to_json(filename)
+        return new_items
+
     def save_to_json(self, filename="scraped_companies.json"):
         """Save scraped data to JSON file"""
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(self.scraped_companies, f, indent=2, ensure_ascii=False)
+        # News items only count as seen once they are stored
+        self.news_tracker.save()
         logger.info(f"Data saved to {filename}")
 
     def enhance_with_manual_research(self):